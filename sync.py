@@ -1,80 +1,112 @@
 import os
+import re
 import sys
 import time
+import stat
+import errno
+import ctypes
+import select
+import struct
+import mmap
+import hashlib
+import queue
+import threading
 import shutil
+import fnmatch
+import atexit
 import logging
+import logging.handlers
 import argparse
 from pathlib import Path
-from filecmp import dircmp
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # The walk must never block on a slow log disk; when the queue is full
+    # the record is dropped instead.
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
 
 class Synchronizer():
-    def __init__(self, source, dest, logfile, interval=600, follow_symlinks=True, dryrun=True, by_content=False, stop_on_errors=False, one_shot=False):
+    log_formatter = logging.Formatter('%(asctime)s - %(module)s - %(levelname)s - %(message)s')
+
+    def __init__(self, source, dest, logfile, interval=600, follow_symlinks=True, dryrun=True, by_content=False, stop_on_errors=False, one_shot=False, max_concurrency=1, trust_dir_mtime=False, event_driven=False, excludes=None):
         log_path = Path(logfile).absolute()
         if not (log_path.parent.exists() and log_path.parent.is_dir()):
             raise Exception("Invalid log file path")
         self.logger = logging.getLogger(__name__)
-        log_formatter = logging.Formatter('%(asctime)s - %(module)s - %(levelname)s - %(message)s')
-        file_handler = logging.FileHandler(log_path)
-        file_handler.setFormatter(log_formatter)
-        self.logger.addHandler(file_handler)
-        stdout_handler = logging.StreamHandler(sys.stdout)
-        stdout_handler.setFormatter(log_formatter)
-        self.logger.addHandler(stdout_handler)
+        self.logger.propagate = False
+        # Repeat constructions reuse the pipeline the first one attached;
+        # without the guard every instance would add another handler and
+        # each record would be written once per instance.
+        if not self.logger.handlers:
+            # delay=True postpones opening the file until the first record.
+            file_handler = logging.FileHandler(log_path, delay=True)
+            file_handler.setFormatter(self.log_formatter)
+            stdout_handler = logging.StreamHandler(sys.stdout)
+            stdout_handler.setFormatter(self.log_formatter)
+            # Writes happen on a dedicated listener thread; the sync threads only
+            # pay for an O(1) queue handoff per record.
+            log_queue = queue.Queue(maxsize=10000)
+            log_listener = logging.handlers.QueueListener(log_queue, file_handler, stdout_handler)
+            self.logger.addHandler(DroppingQueueHandler(log_queue))
+            log_listener.start()
+            atexit.register(log_listener.stop)
         #self.logger.setLevel(logging.DEBUG)
         self.logger.setLevel(logging.INFO)
         self.logger.debug("Synchonizer starting with params:")
-        self.logger.debug(f"source = {source}")
-        self.logger.debug(f"dest = {dest}")
-        self.logger.debug(f"logfile = {logfile}")
-        self.logger.debug(f"interval = {interval}")
-        self.logger.debug(f"follow_symlinks = {follow_symlinks}")
-        self.logger.debug(f"dryrun = {dryrun}")
-        self.logger.debug(f"by_content = {by_content}")
-        self.logger.debug(f"stop_on_errors = {stop_on_errors}")
-        self.logger.debug(f"one_shot = {one_shot}")
+        self.logger.debug("source = %s", source)
+        self.logger.debug("dest = %s", dest)
+        self.logger.debug("logfile = %s", logfile)
+        self.logger.debug("interval = %s", interval)
+        self.logger.debug("follow_symlinks = %s", follow_symlinks)
+        self.logger.debug("dryrun = %s", dryrun)
+        self.logger.debug("by_content = %s", by_content)
+        self.logger.debug("stop_on_errors = %s", stop_on_errors)
+        self.logger.debug("one_shot = %s", one_shot)
+        self.logger.debug("max_concurrency = %s", max_concurrency)
+        self.logger.debug("trust_dir_mtime = %s", trust_dir_mtime)
+        self.logger.debug("event_driven = %s", event_driven)
+        self.logger.debug("excludes = %s", excludes)
+        if max_concurrency < 1:
+            self.logger.critical("Invalid max concurrency %s", max_concurrency)
+            raise Exception("Invalid max concurrency")
         # Following section may raise exceptions during path checks in the setup process.
         # Letting them propagate and stop execution is the desired result here.
-        source_path = Path(source).absolute()
-        if not follow_symlinks:
-            for parent in source_path.parents:
-                if parent.is_symlink():
-                    self.logger.critical(f"SOURCE path {source_path} contains symlink(s) but --do-not-follow-symlinks is enabled")
-                    raise Exception(f"SOURCE path contains symlink(s)")
-        if not source_path.exists():
-            self.logger.critical(f"SOURCE path {source_path} does not exist")
-            raise Exception(f"SOURCE path does not exist")
-        if not source_path.is_dir():
-            self.logger.critical(f"SOURCE path {source_path} is not a directory")
-            raise Exception(f"SOURCE path is not a directory")
-        source_path_resolved = source_path.resolve()
-        if source_path_resolved != source_path:
-            source_path = source_path_resolved
-            self.logger.info(f"SOURCE path {source} resolved to {source_path}")
-        dest_path = Path(dest).absolute()
-        if not follow_symlinks:
-            for parent in dest_path.parents:
-                if parent.is_symlink():
-                    self.logger.critical(f"DEST path {dest_path} contains symlink(s) but --do-not-follow-symlinks is enabled")
-                    raise Exception(f"DEST path contains symlink(s)")
-        if not dest_path.exists():
-            self.logger.critical(f"DEST path {dest_path} does not exist")
-            raise Exception(f"DEST path does not exist")
-        if not dest_path.is_dir():
-            self.logger.critical(f"DEST path {dest_path} is not a directory")
-            raise Exception(f"DEST path is not a directory")
-        dest_path_resolved = dest_path.resolve()
-        if dest_path_resolved != dest_path:
-            dest_path = dest_path_resolved
-            self.logger.info(f"DEST path {dest} resolved to {dest_path}")
-        if source_path.is_relative_to(dest_path) or dest_path.is_relative_to(source_path):
-            self.logger.critical(f"SOURCE {source_path} or DEST {dest_path} is relative to the other.")
+        source_path = self._validate_root("SOURCE", source, follow_symlinks)
+        dest_path = self._validate_root("DEST", dest, follow_symlinks)
+        # realpath already resolved every symlink, so containment reduces to a
+        # string prefix check; the trailing separator keeps /a/bc from looking
+        # like a child of /a/b.
+        source_str = os.fspath(source_path) + os.sep
+        dest_str = os.fspath(dest_path) + os.sep
+        if source_str.startswith(dest_str) or dest_str.startswith(source_str):
+            self.logger.critical("SOURCE %s or DEST %s is relative to the other.", source_path, dest_path)
             raise Exception(f"SOURCE or DEST is relative to the other.")
         self.source_inos = {}
-        for parent in source_path.parents:
-            self.source_inos[parent.stat().st_ino] = parent
-        self.source_inos[source_path.stat().st_ino] = source_path
-        self.ignore_list = []
+        if follow_symlinks:
+            # A followed symlink can lead back into an ancestor of the source,
+            # so ancestors are pre-seeded to refuse that descent outright.
+            # Without symlink traversal the walker can never ascend and the
+            # O(depth) stat calls are skipped.
+            for parent in source_path.parents:
+                parent_stat = os.stat(parent)
+                self.source_inos[(parent_stat.st_dev, parent_stat.st_ino)] = parent
+        source_stat = source_path.stat()
+        self.source_inos[(source_stat.st_dev, source_stat.st_ino)] = source_path
+        self.ignore_list = set()
         self.seen_inos = {}
+        self.dir_cache = {}
+        self.hardlinks = {}
+        self.hash_cache = {}
         self.source = source_path
         self.dest = dest_path
         self.follow_symlinks = follow_symlinks
@@ -82,197 +114,830 @@ class Synchronizer():
         self.by_content = by_content
         self.stop_on_errors = stop_on_errors
         self.one_shot = one_shot
+        self.trust_dir_mtime = trust_dir_mtime
+        self.event_driven = event_driven
+        # All patterns are fused into one compiled alternation, so matching an
+        # entry name costs a single regex pass no matter how many patterns.
+        if excludes:
+            self.exclude_matcher = re.compile('|'.join(fnmatch.translate(pattern) for pattern in excludes))
+        else:
+            self.exclude_matcher = None
         self.interval = interval
-        self.next_run = time.time()
-
-    def sync_dirs(self, source, dest, compared):
-        items_to_check = [source.joinpath(item) for item in compared.left_list] + [dest.joinpath(item) for item in compared.right_list]
-        funny_items = [item for item in items_to_check if self.is_funny(item, self.follow_symlinks)]
-        self.ignore_list += funny_items
-        for item in funny_items:
-            self.logger.warning(f"{item} in not a regular file, symlink or directory. Ignoring.")
-        for dir_name, dir_compared in [ (dir, cmp) for (dir, cmp) in compared.subdirs.items() if not source.joinpath(dir) in self.ignore_list]:
-            dir_path = source.joinpath(dir_name)
-            try:
-                ino = dir_path.stat(follow_symlinks=self.follow_symlinks).st_ino
-                if ino in self.seen_inos.keys():
-                    self.logger.warning(f"Directory {dir_path} has been previously encountered at {self.seen_inos[ino]}, skipping.")
-                else:
-                    self.seen_inos[ino] = dir_path
-                    self.sync_dirs(source.joinpath(dir_name), dest.joinpath(dir_name), dir_compared)
-            except Exception as e:
-                if self.stop_on_errors:
-                    self.logger.error(f"Error '{e}' encountered while processing '{dir_path}'. Exitting.")
-                    sys.exit(1)
-                else:
-                    self.logger.error(f"Error '{e}' encountered while processing '{dir_path}'. Continuing.")
-        for item in [ dest.joinpath(item) for item in compared.right_only if not dest.joinpath(item) in self.ignore_list]:
-            try:
-                if self.dryrun:
-                    self.logger.info(f"Dryrun enabled. NOT deleting {item}.")
-                    continue
-                if not self.follow_symlinks and item.is_symlink():
-                    self.logger.info(f"Deleting symlink {item}.")
-                    item.unlink()
-                elif item.is_dir(follow_symlinks=self.follow_symlinks):
-                    self.logger.info(f"Deleting directory tree {item}.")
-                    shutil.rmtree(item)
-                elif item.is_file():
-                    self.logger.info(f"Deleting file {item}.")
-                    item.unlink()
-                else:
-                    raise Exception(f"SHOULD NOT HAPPEN: {item} is not a regular file, symlink or directory. NOT deleting.")
-            except Exception as e:
-                if self.stop_on_errors:
-                    self.logger.error(f"Error '{e}' encountered while processing '{item}'. Exitting.")
-                    sys.exit(1)
-                else:
-                    self.logger.error(f"Error '{e}' encountered while processing '{item}'. Continuing.")
-        for item in [ item for item in compared.left_only if not source.joinpath(item) in self.ignore_list]:
-            source_path = source.joinpath(item)
-            dest_path = dest.joinpath(item)
-            try:
-                if self.dryrun:
-                    self.logger.info(f"Dryrun enabled. NOT copying {item}.")
-                    continue
-                if not self.follow_symlinks and source_path.is_symlink():
-                    self.logger.info(f"Copying symlink {source_path}.")
-                    self.copy_symlink(source_path, dest_path)
-                elif source_path.is_dir(follow_symlinks=self.follow_symlinks):
-                    self.logger.info(f"Copying directory tree {source_path}.")
-                    if self.copy_tree(source_path, dest_path):
-                        shutil.copytree(source_path, dest_path, not self.follow_symlinks)
-                elif source_path.is_file(follow_symlinks=self.follow_symlinks):
-                    self.logger.info(f"Copying file {source_path}.")
-                    shutil.copy2(source_path, dest_path)
-                else:
-                    raise Exception(f"SHOULD NOT HAPPEN: {source_path} is not a regular file, symlink or directory. NOT copying")
-            except Exception as e:
-                if self.stop_on_errors:
-                    self.logger.error(f"Error '{e}' encountered while processing '{source_path}'. Exitting.")
-                    sys.exit(1)
-                else:
-                    self.logger.error(f"Error '{e}' encountered while processing '{source_path}'. Continuing.")
-        for item in [ item for item in compared.common_funny if not source.joinpath(item) in self.ignore_list]:
-            source_path = source.joinpath(item)
-            dest_path = dest.joinpath(item)
-            try:
-                if self.dryrun:
-                    self.logger.info(f"Dryrun enabled. NOT replacing {dest_path} with {source_path}.")
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='sync-worker')
+        # Directory walking gets its own pool so a walk task blocking on its
+        # file batch can never starve the batch of workers; the walk is
+        # metadata-latency bound, so it gets more threads than cores.
+        self.walk_executor = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4), thread_name_prefix='walk-worker')
+        # Bounds the file actions in flight across all directories; without it
+        # a single wide directory could queue its entire batch at once.
+        self._action_slots = threading.Semaphore(4096)
+        self.seen_lock = threading.Lock()
+        self.hardlink_lock = threading.Lock()
+        self.dry_lock = threading.Lock()
+        self._dry_deletes = 0
+        self._dry_copies = 0
+        self._dry_replaces = 0
+        # Per-item log calls check this plain attribute instead of walking
+        # the logger hierarchy via isEnabledFor on every entry; it is
+        # refreshed at the start of each cycle.
+        self.log_info = self.logger.isEnabledFor(logging.INFO)
+        self.next_run = time.monotonic()
+
+    def _validate_root(self, role, path, follow_symlinks):
+        # One realpath call resolves the whole chain; the resolved string is
+        # then what every later comparison and prefix check works against.
+        given_path = Path(path).absolute()
+        resolved_path = Path(os.path.realpath(given_path))
+        if not follow_symlinks:
+            for parent in given_path.parents:
+                if parent.is_symlink():
+                    self.logger.critical("%s path %s contains symlink(s) but --do-not-follow-symlinks is enabled", role, given_path)
+                    raise Exception(f"{role} path contains symlink(s)")
+        if not resolved_path.exists():
+            self.logger.critical("%s path %s does not exist", role, resolved_path)
+            raise Exception(f"{role} path does not exist")
+        if not resolved_path.is_dir():
+            self.logger.critical("%s path %s is not a directory", role, resolved_path)
+            raise Exception(f"{role} path is not a directory")
+        if resolved_path != given_path:
+            self.logger.info("%s path %s resolved to %s", role, path, resolved_path)
+        return resolved_path
+
+    @staticmethod
+    def _scan(path):
+        # os.scandir already reads the directory through getdents64 in C and
+        # exposes the d_type for free; the DirEntry objects additionally cache
+        # the stat result the compare pass needs for common files. Parsing
+        # linux_dirent64 buffers ourselves would save the per-entry wrapper
+        # allocation but lose that stat cache (and the Windows path), so the
+        # entries are kept as scandir hands them out.
+        with os.scandir(path) as entries:
+            return {entry.name: entry for entry in entries}
+
+    def _entry_type(self, entry):
+        # DirEntry caches the d_type reported by the directory read, so these
+        # checks normally cost no extra syscalls.
+        if entry.is_dir(follow_symlinks=self.follow_symlinks):
+            return 'dir'
+        if entry.is_file(follow_symlinks=self.follow_symlinks):
+            return 'file'
+        if entry.is_symlink():
+            return 'symlink'
+        return 'funny'
+
+    # Relative syscalls through an open directory fd resolve a single name
+    # component instead of re-walking the whole path from the root.
+    use_dir_fd = {os.open, os.unlink, os.readlink} <= os.supports_dir_fd
+
+    def sync_dirs(self, source, dest):
+        # Explicit worklist instead of recursion: a directory's scan results
+        # are dropped as soon as its children are queued, so memory stays
+        # bounded by the frontier rather than the whole path down the tree.
+        # Sibling directories are independent, so once the frontier is wide
+        # enough they are processed concurrently on the walk pool; narrow
+        # levels stay on this thread to avoid paying dispatch for a couple
+        # of directories.
+        worklist = deque([(source, dest)])
+        in_flight = set()
+        while worklist or in_flight:
+            if in_flight or len(worklist) > 4:
+                while worklist:
+                    dir_source, dir_dest = worklist.pop()
+                    in_flight.add(self.walk_executor.submit(self._sync_dir_task, dir_source, dir_dest))
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    worklist.extend(future.result())
+            else:
+                dir_source, dir_dest = worklist.pop()
+                worklist.extend(self._sync_dir_task(dir_source, dir_dest))
+
+    def _sync_dir_task(self, dir_source, dir_dest):
+        try:
+            return self._sync_one_dir(dir_source, dir_dest)
+        except SystemExit:
+            raise
+        except Exception as e:
+            if self.stop_on_errors:
+                self.logger.error("Error '%s' encountered while processing '%s'. Exitting.", e, dir_source)
+                sys.exit(1)
+            else:
+                self.logger.error("Error '%s' encountered while processing '%s'. Continuing.", e, dir_source)
+                return []
+
+    def _remember_dir(self, key, dir_path):
+        # Check-and-record must be atomic now that sibling directories are
+        # walked concurrently; returns where the inode was first seen, or
+        # None if this call claimed it.
+        with self.seen_lock:
+            seen_at = self.seen_inos.get(key)
+            if seen_at is None:
+                self.seen_inos[key] = dir_path
+        return seen_at
+
+    def _sync_one_dir(self, source, dest):
+        children = []
+        had_errors = False
+        dry_deletes = dry_copies = dry_replaces = 0
+        # Join destination paths by concatenation against a prefix computed
+        # once per directory; os.path.join per entry is measurable on wide
+        # directories and the names here are always bare entry names.
+        src_prefix = os.fspath(source) + os.sep
+        dst_prefix = os.fspath(dest) + os.sep
+        src_stat = None
+        if self.trust_dir_mtime:
+            src_stat = os.stat(source)
+            cached = self.dir_cache.get((src_stat.st_dev, src_stat.st_ino))
+            if cached is not None and cached[0] == (src_stat.st_mtime_ns, src_stat.st_size, os.stat(dest).st_mtime_ns):
+                # Unchanged stamp means no entries were added, removed or
+                # renamed here since the last run; descend into the remembered
+                # subdirectories without re-scanning this level.
+                for dir_name in cached[1]:
+                    dir_path = src_prefix + dir_name
+                    try:
+                        dir_stat = os.stat(dir_path, follow_symlinks=self.follow_symlinks)
+                        key = (dir_stat.st_dev, dir_stat.st_ino)
+                        seen_at = self._remember_dir(key, dir_path)
+                        if seen_at is not None:
+                            self.logger.warning("Directory %s has been previously encountered at %s, skipping.", dir_path, seen_at)
+                        else:
+                            children.append((dir_path, dst_prefix + dir_name))
+                    except Exception as e:
+                        if self.stop_on_errors:
+                            self.logger.error("Error '%s' encountered while processing '%s'. Exitting.", e, dir_path)
+                            sys.exit(1)
+                        else:
+                            self.logger.error("Error '%s' encountered while processing '%s'. Continuing.", e, dir_path)
+                            had_errors = True
+                return children
+        src_entries = self._scan(source)
+        dst_entries = self._scan(dest)
+        if self.exclude_matcher is not None:
+            src_entries = {name: entry for name, entry in src_entries.items() if not self.exclude_matcher.match(name)}
+            dst_entries = {name: entry for name, entry in dst_entries.items() if not self.exclude_matcher.match(name)}
+        src_dir_fd = dst_dir_fd = None
+        if self.use_dir_fd:
+            cloexec = getattr(os, 'O_CLOEXEC', 0)
+            src_dir_fd = os.open(source, os.O_RDONLY | os.O_DIRECTORY | cloexec)
+            dst_dir_fd = os.open(dest, os.O_RDONLY | os.O_DIRECTORY | cloexec)
+        try:
+            # One classified pass over the union of names replaces the former
+            # per-branch loops; each entry's types and ignore status are
+            # decided once, and every resulting action lands in the same
+            # batch. Only content hashing is deferred, so readahead can cover
+            # the whole candidate set before the first byte is hashed.
+            batch = []
+            hash_pending = []
+            for name in sorted(src_entries.keys() | dst_entries.keys()):
+                src_entry = src_entries.get(name)
+                dst_entry = dst_entries.get(name)
+                funny = False
+                for entry in (src_entry, dst_entry):
+                    if entry is not None and self.is_funny(entry, self.follow_symlinks):
+                        self.ignore_list.add(entry.path)
+                        self.logger.warning("%s in not a regular file, symlink or directory. Ignoring.", entry.path)
+                        funny = True
+                if funny:
                     continue
-                if dest_path in self.ignore_list:
-                    self.logger.warn(f"Cannot replace ingnored {dest_path} with {source_path}")
+                item = src_entry.path if src_entry is not None else dst_entry.path
+                if item in self.ignore_list:
                     continue
-                if source_path.is_dir(follow_symlinks=self.follow_symlinks):
-                    self.logger.info(f"Replacing {dest_path} with directory tree {source_path}.")
-                    if dest_path.is_dir(follow_symlinks=self.follow_symlinks):
-                        shutil.rmtree(dest_path)
+                try:
+                    if src_entry is None:
+                        # Present only in the destination: delete.
+                        if self.dryrun:
+                            self.logger.debug("Dryrun enabled. NOT deleting %s.", item)
+                            dry_deletes += 1
+                            continue
+                        entry_type = self._entry_type(dst_entry)
+                        if not self.follow_symlinks and entry_type == 'symlink':
+                            batch.append((dst_entry.inode(), item, self._delete_symlink, item, name, dst_dir_fd))
+                        elif entry_type == 'dir':
+                            # Directory trees are deleted on the calling thread so no
+                            # subtree is ever walked by more than one worker.
+                            if self.log_info:
+                                self.logger.info("Deleting directory tree %s.", item)
+                            if dst_dir_fd is not None:
+                                shutil.rmtree(name, dir_fd=dst_dir_fd)
+                            else:
+                                shutil.rmtree(item)
+                        else:
+                            batch.append((dst_entry.inode(), item, self._delete_file, item, name, dst_dir_fd))
+                        continue
+                    source_path = item
+                    dest_path = dst_prefix + name
+                    if dst_entry is None:
+                        # Present only in the source: copy.
+                        if self.dryrun:
+                            self.logger.debug("Dryrun enabled. NOT copying %s.", name)
+                            dry_copies += 1
+                            continue
+                        entry_type = self._entry_type(src_entry)
+                        if not self.follow_symlinks and entry_type == 'symlink':
+                            batch.append((src_entry.inode(), source_path, self._copy_new_symlink, source_path, dest_path))
+                        elif entry_type == 'dir':
+                            if self.log_info:
+                                self.logger.info("Copying directory tree %s.", source_path)
+                            if not self.copy_tree(source_path, dest_path):
+                                had_errors = True
+                        else:
+                            batch.append((src_entry.inode(), source_path, self._copy_new_file, source_path, dest_path,
+                                          src_entry.stat(follow_symlinks=self.follow_symlinks) if entry_type == 'file' else None))
+                        continue
+                    src_type = self._entry_type(src_entry)
+                    dst_type = self._entry_type(dst_entry)
+                    if src_type == dst_type == 'dir':
+                        dir_stat = src_entry.stat(follow_symlinks=self.follow_symlinks)
+                        key = (dir_stat.st_dev, dir_stat.st_ino)
+                        seen_at = self._remember_dir(key, source_path)
+                        if seen_at is not None:
+                            self.logger.warning("Directory %s has been previously encountered at %s, skipping.", source_path, seen_at)
+                        else:
+                            children.append((source_path, dest_path))
+                    elif src_type != dst_type:
+                        # Type mismatch: replace the destination entry.
+                        if self.dryrun:
+                            self.logger.debug("Dryrun enabled. NOT replacing %s with %s.", dest_path, source_path)
+                            dry_replaces += 1
+                            continue
+                        if dest_path in self.ignore_list:
+                            self.logger.warning("Cannot replace ingnored %s with %s", dest_path, source_path)
+                            continue
+                        if src_type == 'dir':
+                            if self.log_info:
+                                self.logger.info("Replacing %s with directory tree %s.", dest_path, source_path)
+                            if dst_type == 'dir':
+                                shutil.rmtree(dest_path)
+                            else:
+                                os.unlink(dest_path)
+                            if not self.copy_tree(source_path, dest_path):
+                                had_errors = True
+                        else:
+                            batch.append((src_entry.inode(), source_path, self._replace_item, source_path, dest_path, src_type, dst_type,
+                                          src_entry.stat(follow_symlinks=self.follow_symlinks) if src_type == 'file' else None))
+                    elif src_type == 'symlink':
+                        if src_dir_fd is not None:
+                            src_target = os.readlink(name, dir_fd=src_dir_fd)
+                            dst_target = os.readlink(name, dir_fd=dst_dir_fd)
+                        else:
+                            src_target = os.readlink(source_path)
+                            dst_target = os.readlink(dest_path)
+                        if src_target == dst_target:
+                            continue
+                        if self.dryrun:
+                            self.logger.debug("Dryrun enabled. NOT replacing %s with %s.", dest_path, source_path)
+                            dry_replaces += 1
+                            continue
+                        if dest_path in self.ignore_list:
+                            self.logger.warning("Cannot replace ingnored %s with %s", dest_path, source_path)
+                            continue
+                        batch.append((src_entry.inode(), source_path, self._replace_item, source_path, dest_path, 'symlink', 'symlink', None))
                     else:
-                        dest_path.unlink()
-                    if self.copy_tree(source_path, dest_path):
-                        shutil.copytree(source_path, dest_path, not self.follow_symlinks)
-                else:
-                    self.copy_file(source_path, dest_path)
+                        # The scandir pass already fetched both stats; a size
+                        # mismatch proves the files differ without reading either.
+                        src_file_stat = src_entry.stat(follow_symlinks=self.follow_symlinks)
+                        dst_file_stat = dst_entry.stat(follow_symlinks=self.follow_symlinks)
+                        if self.by_content:
+                            if src_file_stat.st_size == dst_file_stat.st_size:
+                                hash_pending.append((src_entry.inode(), source_path, dest_path, src_file_stat, dst_file_stat))
+                                continue
+                        elif (src_file_stat.st_size, src_file_stat.st_mtime_ns) == \
+                                (dst_file_stat.st_size, dst_file_stat.st_mtime_ns):
+                            continue
+                        if self.dryrun:
+                            self.logger.debug("Dryrun enabled. NOT replacing %s with %s.", dest_path, source_path)
+                            dry_replaces += 1
+                            continue
+                        if dest_path in self.ignore_list:
+                            self.logger.warning("Cannot replace ingnored %s with %s", dest_path, source_path)
+                            continue
+                        if self.by_content:
+                            # The digest of content about to be destroyed must
+                            # not outlive the inode that may be reused for it.
+                            self.hash_cache.pop(self._hash_key(dst_file_stat), None)
+                        batch.append((src_entry.inode(), source_path, self._replace_item, source_path, dest_path, 'file', 'file', src_file_stat))
+                except Exception as e:
+                    if self.stop_on_errors:
+                        self.logger.error("Error '%s' encountered while processing '%s'. Exitting.", e, item)
+                        sys.exit(1)
+                    else:
+                        self.logger.error("Error '%s' encountered while processing '%s'. Continuing.", e, item)
+                        had_errors = True
+            if hash_pending:
+                self._prefetch_hash_candidates(hash_pending)
+            for inode, source_path, dest_path, src_file_stat, dst_file_stat in hash_pending:
+                try:
+                    if self._content_hash(source_path, src_file_stat) == self._content_hash(dest_path, dst_file_stat):
+                        continue
+                    if self.dryrun:
+                        self.logger.debug("Dryrun enabled. NOT replacing %s with %s.", dest_path, source_path)
+                        dry_replaces += 1
+                        continue
+                    if dest_path in self.ignore_list:
+                        self.logger.warning("Cannot replace ingnored %s with %s", dest_path, source_path)
+                        continue
+                    self.hash_cache.pop(self._hash_key(dst_file_stat), None)
+                    batch.append((inode, source_path, self._replace_item, source_path, dest_path, 'file', 'file', src_file_stat))
+                except Exception as e:
+                    if self.stop_on_errors:
+                        self.logger.error("Error '%s' encountered while processing '%s'. Exitting.", e, source_path)
+                        sys.exit(1)
+                    else:
+                        self.logger.error("Error '%s' encountered while processing '%s'. Continuing.", e, source_path)
+                        had_errors = True
+            if not self._run_batch(batch):
+                had_errors = True
+        finally:
+            if src_dir_fd is not None:
+                os.close(src_dir_fd)
+            if dst_dir_fd is not None:
+                os.close(dst_dir_fd)
+        if self.dryrun and (dry_deletes or dry_copies or dry_replaces):
+            # One locked aggregation per directory, not one log write per
+            # skipped entry; a dry run stays bound by enumeration alone.
+            with self.dry_lock:
+                self._dry_deletes += dry_deletes
+                self._dry_copies += dry_copies
+                self._dry_replaces += dry_replaces
+        # A stamp recorded over a partial sync would make the next run skip
+        # the very directory that still needs repair, so errors veto it.
+        if self.trust_dir_mtime and not self.dryrun and not had_errors:
+            # Stamp with the pre-sync source stat: if the source changed while
+            # we were syncing, the stamp will not match and the next run rescans.
+            subdir_names = [name for name, entry in src_entries.items()
+                            if self._entry_type(entry) == 'dir' and entry.path not in self.ignore_list]
+            try:
+                self.dir_cache[(src_stat.st_dev, src_stat.st_ino)] = ((src_stat.st_mtime_ns, src_stat.st_size, os.stat(dest).st_mtime_ns), subdir_names)
             except Exception as e:
-                if self.stop_on_errors:
-                    self.logger.error(f"Error '{e}' encountered while processing '{source_path}'. Exitting.")
-                    sys.exit(1)
-                else:
-                    self.logger.error(f"Error '{e}' encountered while processing '{source_path}'. Continuing.")
-        for item in [ item for item in compared.diff_files if not source.joinpath(item) in self.ignore_list]:
-            source_path = source.joinpath(item)
-            dest_path = dest.joinpath(item)
+                self.logger.debug("Not caching stamp for %s: %s", source, e)
+        return children
+
+    @staticmethod
+    def _hash_key(path_stat):
+        return (path_stat.st_dev, path_stat.st_ino, path_stat.st_mtime_ns, path_stat.st_size)
+
+    @staticmethod
+    def _hash_contents(f):
+        hasher = hashlib.blake2b()
+        if hasattr(os, 'posix_fadvise'):
             try:
-                if self.dryrun:
-                    self.logger.info(f"Dryrun enabled. NOT replacing {dest_path} with {source_path}.")
-                    continue
-                if dest_path in self.ignore_list:
-                    self.logger.warn(f"Cannot replace ingnored {dest_path} with {source_path}")
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty file, or a filesystem that cannot be mapped; fall back to
+            # plain unbuffered reads.
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(chunk)
+            return hasher.digest()
+        with mm:
+            # The mapping hands the page cache to the hasher without any
+            # read() copies; 16 MiB slices keep each update call bounded so
+            # a multi-GB file never pins the GIL in one long stretch.
+            with memoryview(mm) as view:
+                for offset in range(0, len(view), 16 << 20):
+                    hasher.update(view[offset:offset + (16 << 20)])
+        return hasher.digest()
+
+    def _prefetch_hash_candidates(self, hash_pending):
+        # Kick off kernel readahead for every file the hashing loop is about
+        # to read, so their contents stream in concurrently instead of one
+        # file at a time.
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        for _, source_path, dest_path, src_file_stat, dst_file_stat in hash_pending:
+            if src_file_stat.st_size == 0:
+                continue
+            for path, path_stat in ((source_path, src_file_stat), (dest_path, dst_file_stat)):
+                if self._hash_key(path_stat) in self.hash_cache:
                     continue
-                self.copy_file(source_path, dest_path)
-            except Exception as e:
-                if self.stop_on_errors:
-                    self.logger.error(f"Error '{e}' encountered while processing '{source_path}'. Exitting.")
-                    sys.exit(1)
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                    try:
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                    finally:
+                        os.close(fd)
+                except OSError:
+                    pass
+
+    def _content_hash(self, path, path_stat):
+        # Hashes are remembered by file identity and mtime, so files that did
+        # not change since an earlier cycle are never re-read.
+        key = self._hash_key(path_stat)
+        digest = self.hash_cache.get(key)
+        if digest is None:
+            with open(path, 'rb', buffering=0) as f:
+                digest = self._hash_contents(f)
+            self.hash_cache[key] = digest
+        return digest
+
+    def _reseed_dest_digest(self, source_stat, dest):
+        # A freshly written dest can land on a freed inode while copystat
+        # gives it the source mtime, so its identity key may collide with the
+        # cached digest of the content that was just replaced; the next cycle
+        # would then keep "repairing" an already equal file forever. Reseed
+        # the entry with the source digest, or drop it so the file is
+        # re-hashed.
+        try:
+            dest_key = self._hash_key(os.stat(dest))
+        except OSError:
+            return
+        digest = self.hash_cache.get(self._hash_key(source_stat))
+        if digest is not None:
+            self.hash_cache[dest_key] = digest
+        else:
+            self.hash_cache.pop(dest_key, None)
+
+    def _delete_symlink(self, item, name=None, dir_fd=None):
+        if self.log_info:
+            self.logger.info("Deleting symlink %s.", item)
+        if dir_fd is not None:
+            os.unlink(name, dir_fd=dir_fd)
+        else:
+            os.unlink(item)
+
+    def _delete_file(self, item, name=None, dir_fd=None):
+        if self.log_info:
+            self.logger.info("Deleting file %s.", item)
+        if dir_fd is not None:
+            os.unlink(name, dir_fd=dir_fd)
+        else:
+            os.unlink(item)
+
+    def _copy_new_symlink(self, source, dest):
+        if self.log_info:
+            self.logger.info("Copying symlink %s.", source)
+        self.copy_symlink(source, dest)
+
+    def _copy_new_file(self, source, dest, source_stat=None):
+        if self.log_info:
+            self.logger.info("Copying file %s.", source)
+        self._copy_with_links(source, dest, source_stat)
+
+    def _copy_with_links(self, source, dest, source_stat=None):
+        # Members of a hardlink group are copied once and linked after that,
+        # so the group survives in the mirror instead of becoming N copies.
+        # Callers coming off a directory scan pass the stat the DirEntry
+        # already cached; only ad-hoc callers pay for a fresh one.
+        if source_stat is None:
+            source_stat = os.stat(source)
+        if source_stat.st_nlink > 1:
+            # The lock is held across the first copy of a group so a sibling
+            # link copied concurrently cannot miss the cache and produce an
+            # independent file; later members only hold it for the lookup.
+            key = (source_stat.st_dev, source_stat.st_ino)
+            with self.hardlink_lock:
+                existing = self.hardlinks.get(key)
+                if existing is not None:
+                    if self.log_info:
+                        self.logger.info("Hardlinking %s to already copied %s.", dest, existing)
+                    os.link(existing, dest)
                 else:
-                    self.logger.error(f"Error '{e}' encountered while processing '{source_path}'. Continuing.")
+                    self._copy_file_data(source, dest)
+                    self.hardlinks[key] = dest
+        else:
+            self._copy_file_data(source, dest)
+        if self.by_content:
+            self._reseed_dest_digest(source_stat, dest)
 
-    def copy_tree(self, source, dest):
-        if self.is_funny(source, self.follow_symlinks):
-            self.logger.warning(f"{item} in not a regular file, symlink or directory. Ignoring.")
+    def _copy_file_data(self, source, dest):
+        if not (hasattr(os, 'copy_file_range') or hasattr(os, 'sendfile')):
+            shutil.copy2(source, dest)
+            return
+        cloexec = getattr(os, 'O_CLOEXEC', 0)
+        src_fd = os.open(source, os.O_RDONLY | cloexec)
+        try:
+            dst_fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | cloexec)
+            try:
+                if not self._try_reflink(src_fd, dst_fd):
+                    if hasattr(os, 'posix_fallocate'):
+                        # Reserving the full size up front lets the filesystem
+                        # allocate contiguous extents instead of growing the file
+                        # one transfer chunk at a time.
+                        size = os.fstat(src_fd).st_size
+                        if size > 0:
+                            try:
+                                os.posix_fallocate(dst_fd, 0, size)
+                            except OSError:
+                                pass
+                    self._transfer_data(src_fd, dst_fd)
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+        shutil.copystat(source, dest)
+
+    # FICLONE from linux/fs.h: _IOW(0x94, 9, int).
+    _FICLONE = 0x40049409
+
+    @staticmethod
+    def _try_reflink(src_fd, dst_fd):
+        # On reflink-capable filesystems (btrfs, XFS) a same-device copy is a
+        # constant-time clone of the source extents; no data moves at all.
+        # Cloning only ever works within one filesystem, so a dev mismatch
+        # skips the ioctl attempt outright.
+        if fcntl is None or sys.platform != 'linux':
             return False
-        ino = source.stat().st_ino
-        if ino in self.seen_inos.keys():
-            self.logger.warning(f"Directory {source} has been previously encountered at {self.seen_inos[ino]}, skipping.")
+        if os.fstat(src_fd).st_dev != os.fstat(dst_fd).st_dev:
             return False
-        else:
-            self.seen_inos[ino] = source
-        results = {item : self.copy_tree(item, dest.joinpath(item.name)) for item in source.iterdir() if item.is_dir(follow_symlinks=self.follow_symlinks)}
-        if all(results.values()):
+        try:
+            fcntl.ioctl(dst_fd, Synchronizer._FICLONE, src_fd)
             return True
-        else:
-            for item, safe in results.items():
-                if safe:
-                    shutil.copytree(item, dest.joinpath(item.name), not self.follow_symlinks)
-            for item in source.iterdir():
-                if self.is_funny(item, self.follow_symlinks):
-                    self.logger.warning(f"{item} in not a regular file, symlink or directory. Ignoring.")
-                    continue
-                if (not self.follow_symlinks and item.is_symlink()) or item.is_file(follow_symlinks=self.follow_symlinks):
-                    dest.mkdir(parents=True)
-                    self.copy_file(item, dest.joinpath(item.name))
+        except OSError:
             return False
-            
-    def copy_file(self, source, dest):
-        if not self.follow_symlinks and source.is_symlink():
-            if dest.exists():
-                self.logger.info(f"Removing {dest}.")
-                if dest.is_dir():
-                    shutil.rmtree(dest, follow_symlinks=self.follow_symlinks)
-                else:
-                    dest.unlink()
-            self.logger.info(f"Copying {source} to {dest}.")
+
+    def _transfer_data(self, src_fd, dst_fd):
+        # Prefer in-kernel copies: copy_file_range can reflink on btrfs/XFS
+        # and never bounces the data through userspace; sendfile at least
+        # keeps the copy loop out of Python. The errno values below mean the
+        # kernel or filesystem cannot do it for this pair, so fall through.
+        fallback_errnos = (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP)
+        if hasattr(os, 'copy_file_range'):
+            try:
+                copied = os.copy_file_range(src_fd, dst_fd, 1 << 30)
+                while copied:
+                    copied = os.copy_file_range(src_fd, dst_fd, 1 << 30)
+                return
+            except OSError as e:
+                if e.errno not in fallback_errnos:
+                    raise
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+        if hasattr(os, 'sendfile'):
+            try:
+                offset = 0
+                sent = os.sendfile(dst_fd, src_fd, offset, 1 << 30)
+                while sent:
+                    offset += sent
+                    sent = os.sendfile(dst_fd, src_fd, offset, 1 << 30)
+                return
+            except OSError as e:
+                if e.errno not in fallback_errnos:
+                    raise
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+        with os.fdopen(os.dup(src_fd), 'rb') as src_file, os.fdopen(os.dup(dst_fd), 'wb') as dst_file:
+            shutil.copyfileobj(src_file, dst_file)
+
+    def _run_batch(self, batch):
+        if not batch:
+            return True
+        # Ascending inode order keeps the workers walking the inode table in
+        # one direction instead of seeking randomly across it; the inodes
+        # come from the directory read, so sorting costs no syscalls.
+        batch.sort(key=lambda action: action[0])
+        try:
+            # Submission is throttled by the action slots: a walk thread that
+            # hits a huge directory parks here instead of flooding the copy
+            # pool's queue with the whole batch at once.
+            futures = []
+            for action in batch:
+                self._action_slots.acquire()
+                futures.append(self.executor.submit(self._run_action, action))
+            return all(future.result() for future in futures)
+        except Exception:
+            self.executor.shutdown(cancel_futures=True)
+            sys.exit(1)
+
+    def _run_action(self, action):
+        _, item, func, *args = action
+        try:
+            func(*args)
+            return True
+        except Exception as e:
+            if self.stop_on_errors:
+                self.logger.error("Error '%s' encountered while processing '%s'. Exitting.", e, item)
+                raise
+            else:
+                self.logger.error("Error '%s' encountered while processing '%s'. Continuing.", e, item)
+                return False
+        finally:
+            self._action_slots.release()
+
+    def _classify_path(self, path):
+        # One lstat (plus one stat for followed symlinks) replaces the
+        # is_dir/is_file/is_symlink ladder, which issued a syscall per check.
+        path_stat = os.lstat(path)
+        if getattr(path_stat, 'st_reparse_tag', 0) == getattr(stat, 'IO_REPARSE_TAG_MOUNT_POINT', None):
+            return 'funny'
+        mode = path_stat.st_mode
+        if stat.S_ISLNK(mode):
+            if not self.follow_symlinks:
+                return 'symlink'
+            try:
+                mode = os.stat(path).st_mode
+            except OSError:
+                return 'symlink'
+        if stat.S_ISDIR(mode):
+            return 'dir'
+        if stat.S_ISREG(mode):
+            return 'file'
+        if stat.S_ISLNK(path_stat.st_mode):
+            return 'symlink'
+        return 'funny'
+
+    def copy_tree(self, source, dest):
+        # Single streaming pass: each directory is enumerated exactly once
+        # and its entries are copied as they are seen. The old version
+        # pre-walked the whole tree just to decide whether shutil.copytree
+        # could take over, then enumerated everything a second time.
+        worklist = deque([(os.fspath(source), os.fspath(dest))])
+        dir_pairs = []
+        batch = []
+        while worklist:
+            dir_source, dir_dest = worklist.pop()
+            dir_stat = os.stat(dir_source)
+            key = (dir_stat.st_dev, dir_stat.st_ino)
+            seen_at = self._remember_dir(key, dir_source)
+            if seen_at is not None:
+                self.logger.warning("Directory %s has been previously encountered at %s, skipping.", dir_source, seen_at)
+                continue
+            os.makedirs(dir_dest, exist_ok=True)
+            dir_pairs.append((dir_source, dir_dest))
+            with os.scandir(dir_source) as entries:
+                for entry in entries:
+                    if self.exclude_matcher is not None and self.exclude_matcher.match(entry.name):
+                        continue
+                    entry_type = self._entry_type(entry)
+                    entry_dest = os.path.join(dir_dest, entry.name)
+                    if entry_type == 'dir':
+                        worklist.append((entry.path, entry_dest))
+                    elif entry_type == 'funny':
+                        self.logger.warning("%s in not a regular file, symlink or directory. Ignoring.", entry.path)
+                        self.ignore_list.add(entry.path)
+                    elif entry_type == 'symlink':
+                        if not self.follow_symlinks:
+                            batch.append((entry.inode(), entry.path, self._copy_new_symlink, entry.path, entry_dest))
+                    else:
+                        batch.append((entry.inode(), entry.path, self._copy_new_file, entry.path, entry_dest,
+                                      entry.stat(follow_symlinks=self.follow_symlinks)))
+        ok = self._run_batch(batch)
+        # Deepest directories first, so stamping a parent cannot be undone by
+        # a child created after it.
+        for dir_source, dir_dest in reversed(dir_pairs):
+            try:
+                shutil.copystat(dir_source, dir_dest)
+            except OSError as e:
+                self.logger.debug("Not copying directory metadata to %s: %s", dir_dest, e)
+        return ok
+
+    def _remove_dest(self, dest):
+        try:
+            dest_mode = os.lstat(dest).st_mode
+        except FileNotFoundError:
+            return
+        if self.log_info:
+            self.logger.info("Removing %s.", dest)
+        if stat.S_ISDIR(dest_mode):
+            shutil.rmtree(dest)
+        else:
+            os.unlink(dest)
+
+    def _replace_item(self, source, dest, source_type, dest_type, source_stat=None):
+        # Both sides were already classified from the cached scandir data, so
+        # the stale dest can be removed with the right primitive and the copy
+        # issued straight after without re-statting either path. Fusing the
+        # replace into an os.rename would move the source out of the tree
+        # being mirrored, so the remove+copy pair stays. The source type is
+        # checked before anything is removed; a replacement that cannot be
+        # copied must leave the dest untouched.
+        if source_type not in ('file', 'symlink'):
+            raise Exception(f"SHOULD NOT HAPPEN: {source} is not a regular file or symlink. NOT copying")
+        if self.log_info:
+            self.logger.info("Removing %s.", dest)
+        try:
+            if dest_type == 'dir':
+                shutil.rmtree(dest)
+            else:
+                os.unlink(dest)
+        except FileNotFoundError:
+            pass
+        if self.log_info:
+            self.logger.info("Copying %s to %s.", source, dest)
+        if source_type == 'symlink':
+            # A source classified as a symlink while following links is a
+            # broken link; mirroring it as a link is still the right outcome.
             self.copy_symlink(source, dest)
-        elif source.is_file():
-            if dest.exists():
-                self.logger.info(f"Removing {dest}.")
-                if dest.is_dir():
-                    shutil.rmtree(dest, follow_symlinks=self.follow_symlinks)
-                else:
-                    dest.unlink()
-            self.logger.info(f"Copying {source} to {dest}.")
-            shutil.copy2(source, dest)
+        else:
+            self._copy_with_links(source, dest, source_stat)
+
+    def copy_file(self, source, dest, source_type=None, source_stat=None):
+        if source_type is None:
+            source_type = self._classify_path(source)
+        if not self.follow_symlinks and source_type == 'symlink':
+            self._remove_dest(dest)
+            if self.log_info:
+                self.logger.info("Copying %s to %s.", source, dest)
+            self.copy_symlink(source, dest)
+        elif source_type == 'file':
+            self._remove_dest(dest)
+            if self.log_info:
+                self.logger.info("Copying %s to %s.", source, dest)
+            self._copy_with_links(source, dest, source_stat)
         else:
             raise Exception(f"SHOULD NOT HAPPEN: {source} is not a regular file or symlink. NOT copying")
 
     def copy_symlink(self, source, dest):
-        link_dest = source.readlink()
-        if link_dest.drive.startswith('\\\\?\\'):
-            link_dest = Path(str(link_dest).removeprefix('\\\\?\\'))
-        if link_dest.is_absolute() and link_dest.is_relative_to(self.source):
-            link_target_in_dest = self.dest.joinpath(link_dest.relative_to(self.source))
-            dest.symlink_to(link_target_in_dest, link_dest.is_dir())
+        # Plain string handling: wrapping the target in a Path here cost two
+        # object constructions and re-parsing per symlink for what amounts to
+        # a prefix check and a join.
+        link_dest = os.readlink(source)
+        link_dest = link_dest.removeprefix('\\\\?\\')
+        source_prefix = os.fspath(self.source) + os.sep
+        if os.path.isabs(link_dest) and link_dest.startswith(source_prefix):
+            link_target_in_dest = os.path.join(os.fspath(self.dest), link_dest[len(source_prefix):])
+            os.symlink(link_target_in_dest, dest, target_is_directory=os.path.isdir(link_dest))
         else:
             shutil.copy2(source, dest, follow_symlinks=False)
 
-    def run(self):
-        while True:
-            self.logger.info("Starting sync")
-            self.seen_inos |= self.source_inos
+    def _sync_cycle(self, pairs):
+        self.log_info = self.logger.isEnabledFor(logging.INFO)
+        self.logger.info("Starting sync")
+        self._dry_deletes = self._dry_copies = self._dry_replaces = 0
+        self.seen_inos |= self.source_inos
+        for source, dest in pairs:
             try:
-                self.sync_dirs(self.source, self.dest, dircmp(self.source, self.dest, shallow = not self.by_content))
+                self.sync_dirs(os.fspath(source), os.fspath(dest))
             except Exception as e:
                 if self.stop_on_errors:
-                    self.logger.error(f"Error '{e}' encountered. Exitting.")
+                    self.logger.error("Error '%s' encountered. Exitting.", e)
                     sys.exit(1)
                 else:
-                    self.logger.error(f"Error '{e}' encountered. Continuing.")
-            self.seen_inos.clear()
+                    self.logger.error("Error '%s' encountered. Continuing.", e)
+        self.seen_inos.clear()
+        self.hardlinks.clear()
+        if self.dryrun:
+            self.logger.info("Dryrun: %d would be deleted, %d copied, %d replaced.",
+                             self._dry_deletes, self._dry_copies, self._dry_replaces)
+
+    def _dirty_pairs(self, dirty):
+        # Climb out of vanished directories and drop anything that is already
+        # covered by a dirty ancestor, so each subtree is synced once.
+        pairs = []
+        for path in sorted(dirty):
+            source = Path(path)
+            if not source.is_relative_to(self.source):
+                continue
+            dest = self.dest.joinpath(source.relative_to(self.source))
+            while source != self.source and not (source.is_dir() and dest.is_dir()):
+                source = source.parent
+                dest = self.dest.joinpath(source.relative_to(self.source))
+            covered = False
+            for seen_source, seen_dest in pairs:
+                if source == seen_source or seen_source in source.parents:
+                    covered = True
+                    break
+            if not covered:
+                pairs.append((source, dest))
+        return pairs
+
+    def run(self):
+        watcher = None
+        if self.event_driven:
+            watcher = InotifyWatcher(self.source, self.logger)
+        while True:
+            self._sync_cycle([(self.source, self.dest)])
             if self.one_shot:
                 break
-            self.next_run += self.interval
-            self.logger.info("Sync complete, sleeping until next run")
-            time.sleep(max(self.next_run - time.time(),0))
+            if watcher is None:
+                now = time.monotonic()
+                self.next_run += self.interval
+                if self.next_run < now:
+                    # The sync overran the interval; skip the missed ticks
+                    # instead of running back-to-back to pay off the debt.
+                    self.logger.warning("Sync took longer than the interval, skipping to the next slot")
+                    self.next_run = now + self.interval
+                self.logger.info("Sync complete, sleeping until next run")
+                time.sleep(max(self.next_run - time.monotonic(), 0.0))
+            else:
+                self.logger.info("Sync complete, waiting for events")
+                while True:
+                    dirty, overflowed = watcher.wait(self.interval)
+                    if overflowed:
+                        self.logger.warning("inotify queue overflowed, falling back to a full sync.")
+                        break
+                    if not dirty:
+                        # Quiet interval; run a full pass anyway so external
+                        # changes on the destination side are still repaired.
+                        break
+                    if self.trust_dir_mtime:
+                        self._invalidate_stamps(dirty)
+                    pairs = self._dirty_pairs(dirty)
+                    if pairs:
+                        self._sync_cycle(pairs)
+
+    def _invalidate_stamps(self, dirty):
+        # An in-place edit raises an event but leaves the directory mtime
+        # untouched, so the stamp would wrongly declare the directory clean.
+        for path in dirty:
+            try:
+                path_stat = os.stat(path)
+                self.dir_cache.pop((path_stat.st_dev, path_stat.st_ino), None)
+            except OSError:
+                pass
 
     @staticmethod
     def is_funny(path, follow_symlinks):
@@ -281,6 +946,82 @@ class Synchronizer():
                     path.is_symlink())
 
 
+class InotifyWatcher():
+    # Linux inotify via ctypes; constants from <sys/inotify.h>.
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_IGNORED = 0x00008000
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0x00000800
+    WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, root, logger):
+        if not sys.platform.startswith('linux'):
+            raise Exception("Event driven mode is only supported on Linux")
+        self.logger = logger
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.watches = {}
+        self.add_tree(os.fspath(root))
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.watches[wd] = path
+
+    def add_tree(self, path):
+        try:
+            self.add_watch(path)
+            for dir_path, dir_names, file_names in os.walk(path):
+                for name in dir_names:
+                    self.add_watch(os.path.join(dir_path, name))
+        except OSError as e:
+            self.logger.warning("Could not watch %s: %s", path, e)
+
+    def wait(self, timeout):
+        dirty = set()
+        overflowed = False
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return dirty, overflowed
+        while True:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, cookie, name_len = self.EVENT_HEADER.unpack_from(buffer, offset)
+                offset += self.EVENT_HEADER.size
+                name = os.fsdecode(buffer[offset:offset + name_len].rstrip(b'\0'))
+                offset += name_len
+                if mask & self.IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                if mask & self.IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                path = self.watches.get(wd)
+                if path is None:
+                    continue
+                dirty.add(path)
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self.add_tree(os.path.join(path, name))
+        return dirty, overflowed
+
+
 def main():
     arg_parser = argparse.ArgumentParser(
                     prog='Synchornizer',
@@ -296,6 +1037,10 @@ def main():
     arg_parser.add_argument('--by-content', action='store_true')
     arg_parser.add_argument('--stop-on-errors', action='store_true')
     arg_parser.add_argument('--one-shot', action='store_true')
+    arg_parser.add_argument('--max-concurrency', default=1, type=int)
+    arg_parser.add_argument('--trust-dir-mtime', action='store_true')
+    arg_parser.add_argument('--event-driven', action='store_true')
+    arg_parser.add_argument('--exclude', metavar='PATTERN', action='append')
     try:
         args = arg_parser.parse_args()
     except argparse.ArgumentError:
@@ -310,7 +1055,11 @@ def main():
                      dryrun = args.dry_run,
                      by_content = args.by_content,
                      stop_on_errors = args.stop_on_errors,
-                     one_shot = args.one_shot)
+                     one_shot = args.one_shot,
+                     max_concurrency = args.max_concurrency,
+                     trust_dir_mtime = args.trust_dir_mtime,
+                     event_driven = args.event_driven,
+                     excludes = args.exclude)
     s.run()
 
 if __name__ == '__main__':